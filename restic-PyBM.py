@@ -12,11 +12,14 @@
 import sys
 import subprocess
 import errno
-import yaml
 import os
-import json
+import pickle
 from datetime import datetime, timedelta
 from argparse import ArgumentParser
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from threading import Thread
 
 # ---- constants --------------------------------------------------------------
 
@@ -30,7 +33,7 @@ def create_args():
     parser = ArgumentParser(description=APPDESC)
 
     parser.add_argument('action', action='store',
-                        choices=['run', 'create', 'list', 'prune', 'check'],
+                        choices=('run', 'create', 'list', 'prune', 'check'),
                         help='Action to execute.')
 
     parser.add_argument('repo', action='store', nargs='?', default='ALL_REPOS',
@@ -71,21 +74,59 @@ def parse_config(configFile):
 
   # Check if the config file exists
   if os.path.exists(configFile):
+    # The parsed config is cached on disk keyed on the config file mtime, so
+    # repeated invocations (e.g. from cron) skip the YAML parse entirely
+    cacheFile = configFile + '.cache.pkl'
+    configMtime = os.stat(configFile).st_mtime_ns
+    try:
+      with open(cacheFile, 'rb') as cache:
+        cachedValues = pickle.load(cache)
+      if cachedValues[0] == configMtime:
+        return list(cachedValues[1:])
+    except (OSError, pickle.PickleError, EOFError, IndexError):
+      pass
+
+    # PyYAML is only imported on a cache miss, which keeps its import cost
+    # out of the usual cron-driven invocations
+    import yaml
+
+    # Use the libyaml-backed loader when available, it is much faster
+    Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
     # Attempt to read the config file contents
     try:
-      stream = open(configFile, 'r')
-      configValues = yaml.load(stream, Loader=yaml.BaseLoader)
+      with open(configFile, 'r') as stream:
+        configValues = yaml.load(stream, Loader=Loader)
 
       resticLocation = configValues['restic_binary_location']
       repos = configValues['repos']
 
-      if 'vault' in configValues.keys(): vaultData = configValues['vault']
+      if 'vault' in configValues: vaultData = configValues['vault']
       else: vaultData = ''
 
+      # Refresh the on-disk cache, atomically so a concurrent run never
+      # sees a half-written file.  The cache contains the repo passwords,
+      # so it must never be created with the default umask
+      try:
+        tempFile = cacheFile + '.tmp'
+        cacheFd = os.open(tempFile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(cacheFd, 'wb') as cache:
+          pickle.dump((configMtime, resticLocation, repos, vaultData),
+                      cache, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tempFile, cacheFile)
+      except OSError:
+        pass
+
       return [resticLocation, repos, vaultData]
-    except:
-      print("CRITICAL - Error reading the configuration file %s" %
-            configFile)
+    except (OSError, yaml.YAMLError, TypeError) as error:
+      # TypeError covers a config that parses to something else than a
+      # mapping, e.g. an empty file loading as None
+      print("CRITICAL - Error reading the configuration file %s: %s" %
+            (configFile, error))
+      exit(2)
+    except KeyError as error:
+      print("CRITICAL - Missing key %s in the configuration file %s" %
+            (error, configFile))
       exit(2)
   else:
     print("CRITICAL - Configuration file %s does not exist" % configFile)
@@ -94,18 +135,62 @@ def parse_config(configFile):
 
 # ---- run a command and return its output
 def run_command(command, commandEnv):
+  # command is an argument list, so the restic binary is exec'd directly
+  # without forking an intermediate shell
   result = subprocess.run(command, env=commandEnv,
-                          shell=True, text=True, capture_output=True)
+                          text=True, capture_output=True)
   return result
 
+# ---- retrieve the snapshot timestamps of a repository -----------------------
+def get_snapshot_times(location, commandEnv):
+  # On busy repos 'restic snapshots --json' emits megabytes of JSON from
+  # which only the timestamps matter.  Stream the subprocess output through
+  # ijson when it is installed so only the time fields are materialized;
+  # otherwise fall back to a plain json load of the pipe
+  command = [resticLocation, 'snapshots', '--json', '--group-by', 'host',
+             '--repo', location]
+  child = subprocess.Popen(command, env=commandEnv,
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  # Drain stderr on a helper thread while stdout is being parsed, so a
+  # talkative restic can never block on a full stderr pipe and deadlock us
+  stderrChunks = []
+  stderrDrain = Thread(target=lambda: stderrChunks.append(child.stderr.read()))
+  stderrDrain.start()
+  try:
+    try:
+      import ijson
+      times = list(ijson.items(child.stdout, 'item.snapshots.item.time'))
+    except ImportError:
+      import json
+      groups = json.load(child.stdout)
+      times = [snap['time'] for group in groups for snap in group['snapshots']]
+  except Exception:
+    # restic failed mid-stream and the JSON is truncated or empty; the
+    # caller reports the error based on the return code
+    times = []
+  # Closing stdout unblocks restic if it is still streaming after an
+  # aborted parse; it then dies on the broken pipe instead of hanging
+  child.stdout.close()
+  stderrDrain.join()
+  child.wait()
+  stderrOutput = stderrChunks[0].decode() if stderrChunks else ''
+  return (child.returncode, stderrOutput, times)
+
 # ---- obtain a repository password -------------------------------------------
+
+# Cache the Vault lookups so several repos backed by the same KV path only
+# trigger a single round-trip.  Uses the vault client opened in the mainline.
+@lru_cache(maxsize=None)
+def read_vault_secret(path, mountpoint):
+  return vault.secrets.kv.v2.read_secret_version(path=path, mount_point=mountpoint)
+
 def get_repo_password(repos, currentRepo, vault = False):
   if vault:
-    vaultRead = vault.secrets.kv.v2.read_secret_version(
-      path=repos[currentRepo]['key']['path'], 
-      mount_point=repos[currentRepo]['key']['mountpoint']
+    vaultRead = read_vault_secret(
+      repos[currentRepo]['key']['path'],
+      repos[currentRepo]['key']['mountpoint']
     )
-    if repos[currentRepo]['location'][0:3] == 'b2:':
+    if repos[currentRepo]['location'].startswith('b2:'):
       return(vaultRead['data']['data'])
     else:
       return(vaultRead['data']['data']['password'])
@@ -138,6 +223,211 @@ def end_script(returnCode, stdOut, stdErr, successMsg, errorMsg, quiet, verbose)
       exit(0)
 
 
+# ---- per-repository execution plan ------------------------------------------
+
+# Everything the action execution needs about a repo, resolved once up front
+# so the hot path does no repeated dict lookups or string slicing
+RepoPlan = namedtuple('RepoPlan', ['name', 'location', 'isB2',
+                                   'duplicateSource', 'sourceLocation',
+                                   'includes', 'excludes',
+                                   'maxAgeDays', 'minAgeDays', 'keepWithin'])
+
+def build_plan(repos, name):
+  repoConfig = repos[name]
+  duplicateSource = repoConfig.get('duplicate')
+  # The ages are normalized to ints here once, so the loader may return them
+  # either as ints or as quoted strings
+  maxAge = repoConfig.get('max_age')
+  minAge = repoConfig.get('min_age')
+  if maxAge is not None: maxAge = int(maxAge)
+  if minAge is not None: minAge = int(minAge)
+  return RepoPlan(
+    name=name,
+    location=repoConfig['location'],
+    isB2=repoConfig['location'].startswith('b2:'),
+    duplicateSource=duplicateSource,
+    sourceLocation=repos[duplicateSource]['location'] if duplicateSource else None,
+    includes=repoConfig.get('includes', []),
+    excludes=['lost+found'] + repoConfig.get('excludes', []),
+    maxAgeDays=maxAge,
+    minAgeDays=minAge,
+    keepWithin=('%dd' % maxAge) if maxAge is not None else None,
+  )
+
+# ---- action handlers --------------------------------------------------------
+
+# Each handler runs one action against one repo and returns the completed
+# process together with the success and error messages for the final output
+
+def do_create(plan, commandEnv):
+  # Create a new restic repo with the infos provided in backup.yml
+  command = [resticLocation, 'init', '--repo', plan.location]
+  # If this is a repo that will hold duplicates  amend the restic command
+  if plan.duplicateSource:
+    command += ['--repo2', plan.sourceLocation, '--copy-chunker-params']
+  result = run_command(command, commandEnv)
+  successMessage = ("Repository %s successfully created at location %s" % (plan.name, plan.location))
+  errorMessage = ("Error creating repository %s" % plan.location)
+  return (result, successMessage, errorMessage)
+
+
+def do_prune(plan, commandEnv):
+  # Clean up repo according to provided preservation policy
+  command = [resticLocation, 'forget', '--group-by', 'host',
+             '--keep-within', plan.keepWithin,
+             '--prune', '--repo', plan.location]
+  result = run_command(command, commandEnv)
+  successMessage = ("Repository %s clean up successful" % plan.name)
+  errorMessage = ("Error cleaning up repository %s" % plan.name)
+  return (result, successMessage, errorMessage)
+
+
+def do_check(plan, commandEnv):
+  # Check the repository integrity
+  command = [resticLocation, 'check', '--repo', plan.location]
+  if args.full:
+    command.append('--read-data')
+  result = run_command(command, commandEnv)
+  # Check the restic return code
+  errorMessage = ''
+  if not result.returncode == 0:
+    errorMessage = ("Error checking repository %s" % plan.name)
+  else:
+    # If requested, check the snapshots age
+    if args.age:
+      (snapshotsCode, snapshotsErr, snapshotTimes) = get_snapshot_times(
+          plan.location, commandEnv)
+      if not snapshotsCode == 0 or not snapshotTimes:
+        errorMessage = (
+            "Error getting snapshots for repository %s" % plan.name)
+        result.stderr = result.stderr + "\n" + snapshotsErr
+        result.returncode = 2
+      else:
+        # ISO-8601 timestamps with fixed-width fields sort
+        # lexicographically, so min/max find the oldest and newest
+        # snapshots in one pass without parsing every entry or
+        # assuming restic returned them sorted
+        oldestTime = min(snapshotTimes)
+        newestTime = max(snapshotTimes)
+        # Convert to Pythonic time structures.  Truncating at the
+        # seconds keeps the values naive, hence comparable with
+        # datetime.now()
+        oldestTime = datetime.fromisoformat(oldestTime[0:19])
+        newestTime = datetime.fromisoformat(newestTime[0:19])
+        # Compute snapshots ages versus the current time
+        currentTime = datetime.now()
+        oldDiff = currentTime - oldestTime
+        newDiff = currentTime - newestTime
+        # Check ages versus config
+        if oldDiff > timedelta(days=plan.maxAgeDays):
+          errorMessage = (
+              "Oldest snapshot on %s is %s old" % (plan.name, oldDiff))
+        if newDiff > timedelta(days=plan.minAgeDays):
+          errorMessage = (
+              "Newest snapshot on %s is %s old" % (plan.name, newDiff))
+        else:
+          result.stdout = result.stdout + "\n" + \
+              ("Newest snapshot age: %s" % newDiff) + \
+              "\n" + ("Oldest snapshot age: %s" % oldDiff)
+  successMessage = ("Repository %s is healthy" % plan.name)
+  # errorMessage is already defined
+  return (result, successMessage, errorMessage)
+
+
+def do_list(plan, commandEnv):
+  # List snapshots in the repo
+  command = [resticLocation, 'snapshots', '--group-by', 'host',
+             '--repo', plan.location]
+  result = run_command(command, commandEnv)
+  successMessage = ("Snapshot list retreived for repository %s" % plan.name)
+  errorMessage = ("Error listing snapshots on repository %s" % plan.location)
+  return (result, successMessage, errorMessage)
+
+
+def do_run(plan, commandEnv):
+  # If this is a duplicate type repo, we copy snapshots from the source to the destination
+  if plan.duplicateSource:
+    command = [resticLocation, 'copy', '--repo2', plan.location,
+               '--repo', plan.sourceLocation]
+    result = run_command(command, commandEnv)
+    # Swap the repositories password to enable the unlock
+    commandEnv["RESTIC_PASSWORD"] = commandEnv["RESTIC_PASSWORD2"]
+
+  # For a standard repo, create a new snapshot
+  else:
+    command = [resticLocation, 'backup', '--repo', plan.location]
+    # Incorporate includes (mandatory)
+    for folder in plan.includes:
+      command.append(folder)
+    # Incorporate excludes, lost+found always being the first of them
+    for folder in plan.excludes:
+      command.append('--exclude=' + folder)
+    result = run_command(command, commandEnv)
+
+  successMessage = ("Snapshot successfully created on repository %s" % plan.name)
+  errorMessage = ("Error creating new snapshot on repository %s" % plan.location)
+  return (result, successMessage, errorMessage)
+
+
+# Dispatch table mapping each CLI action on its handler
+ACTIONS = {
+  'run': do_run,
+  'create': do_create,
+  'list': do_list,
+  'prune': do_prune,
+  'check': do_check,
+}
+
+# ---- run the requested action on a single repository ------------------------
+def process_repo(plan):
+
+  # Prepare an ephemeral environment dictionnary for the restic invocation.
+  # Each repo gets its own plain dict copy of the base environment, so
+  # concurrent workers never step on each other and os.environ itself (a
+  # putenv-backed mapping) is never touched
+  commandEnv = dict(baseEnv)
+
+  # Get the repository credentials
+  if args.vault: repoCredentials = get_repo_password(repos, plan.name, vault)
+  else: repoCredentials = get_repo_password(repos, plan.name)
+
+  if plan.isB2:
+    commandEnv["B2_ACCOUNT_ID"] = repoCredentials['keyID']
+    commandEnv["B2_ACCOUNT_KEY"] = repoCredentials['applicationKey']
+    commandEnv["RESTIC_PASSWORD"] = repoCredentials['password']
+  else:
+    commandEnv["RESTIC_PASSWORD"] = repoCredentials
+
+  # If this a duplicate type repo, also get the source repository key
+  if plan.duplicateSource:
+    if args.vault: repoCredentials2 = get_repo_password(repos, plan.duplicateSource, vault)
+    else: repoCredentials2 = get_repo_password(repos, plan.duplicateSource)
+    commandEnv["RESTIC_PASSWORD2"] = repoCredentials2
+
+    # When duplicating we need to invert the password variables 1 and 2
+    if args.action == 'run':
+      commandEnv["RESTIC_PASSWORD"], commandEnv["RESTIC_PASSWORD2"] = \
+          commandEnv["RESTIC_PASSWORD2"], commandEnv["RESTIC_PASSWORD"]
+
+
+
+  # Execute the requested action
+  (result, successMessage, errorMessage) = ACTIONS[args.action](plan, commandEnv)
+
+  # Ensure the repository is unlocked.  Successful restic commands release
+  # their locks on exit, so the extra restic invocation is only needed when
+  # the action failed and may have left a stale lock behind
+  stdOut = result.stdout
+  stdErr = result.stderr
+  if not result.returncode == 0:
+    command = [resticLocation, 'unlock', '--repo', plan.location]
+    resultUnlock = run_command(command, commandEnv)
+    stdOut += resultUnlock.stdout
+    stdErr += resultUnlock.stderr
+
+  return (result.returncode, successMessage, errorMessage, stdOut, stdErr)
+
+
 # ---- mainline ---------------------------------------------------------------
 # -----------------------------------------------------------------------------
 
@@ -146,28 +436,24 @@ args = create_args()
 (resticLocation, repos, vaultData) = parse_config(args.configFile)
 
 # Check if the provided repo exists in the configuration file
-if not args.repo in repos.keys() and not args.repo == 'ALL_REPOS':
+if args.repo not in repos and not args.repo == 'ALL_REPOS':
   print("Repository %s absent from %s" % (args.repo, args.configFile))
   exit(2)
 
-# Prepare an ephemeral environment dictionnary for the restic invocation
-commandEnv = os.environ.copy()
+# Snapshot the environment once; every restic invocation derives its own
+# dict from this copy instead of re-reading or mutating os.environ
+baseEnv = os.environ.copy()
 
 # If requested, self update restic first
 if args.selfUpdate:
-    command = resticLocation + ' self-update'
-    result = run_command(command, commandEnv)
+    command = [resticLocation, 'self-update']
+    result = run_command(command, baseEnv)
     if not result.returncode == 0:
         print("CRITICAL - restic self-update failed: %s." % result.stderr)
         exit(2)
 
 # Build a list with the repos to process
-reposToProcess = []
-if args.repo == 'ALL_REPOS':
-  for entry in repos:
-    reposToProcess.append(entry)
-else:
-  reposToProcess.append(args.repo)
+reposToProcess = list(repos) if args.repo == 'ALL_REPOS' else [args.repo]
 
 # If Vault is to be used, open the connection
 if args.vault:
@@ -178,174 +464,51 @@ if args.vault:
       secret_id=vaultData['secret_id'],
     )
 
-# Initialize accumulation variables used to create the script output messages
-successMessageAccumulated = ''
-errorMessageAccumulated = ''
-stdoutAccumulated = ''
-stderrAccumulated = ''
+# Initialize accumulation variables used to create the script output
+# messages.  Lists joined once at the end avoid the quadratic cost of
+# repeated string concatenation when many repos are processed
+successMessages = []
+errorMessages = []
+stdoutParts = []
+stderrParts = []
 scriptReturnValue = 0
 
-# Run the requested action on all selected repositories
-for currentRepo in reposToProcess:
-
-  # Get the repository credentials
-  if args.vault: repoCredentials = get_repo_password(repos, currentRepo, vault)
-  else: repoCredentials = get_repo_password(repos, currentRepo)  
-  
-  if repos[currentRepo]['location'][0:3] == 'b2:':
-    commandEnv["B2_ACCOUNT_ID"] = repoCredentials['keyID']
-    commandEnv["B2_ACCOUNT_KEY"] = repoCredentials['applicationKey']
-    commandEnv["RESTIC_PASSWORD"] = repoCredentials['password']
-  else:
-    commandEnv["RESTIC_PASSWORD"] = repoCredentials
-
-  # If this a duplicate type repo, also get the source repository key
-  if 'duplicate' in repos[currentRepo].keys():
-    duplicateSource = repos[currentRepo]['duplicate']
-
-    if args.vault: repoCredentials2 = get_repo_password(repos, duplicateSource, vault)
-    else: repoCredentials2 = get_repo_password(repos, duplicateSource)
-    commandEnv["RESTIC_PASSWORD2"] = repoCredentials2
-
-    # When duplicating we need to invert the password variables 1 and 2
-    if args.action == 'run':
-      buffer = commandEnv["RESTIC_PASSWORD2"]
-      commandEnv["RESTIC_PASSWORD2"] = commandEnv["RESTIC_PASSWORD"]
-      commandEnv["RESTIC_PASSWORD"] = buffer
-
-
-  
-  # ---- actions execution ----------------------------------------------------
-
-  if args.action == 'create':
-      # Create a new restic repo with the infos provided in backup.yml
-      command = resticLocation + ' init --repo ' + repos[currentRepo]['location']
-      # If this is a repo that will hold duplicates  amend the restic command
-      if 'duplicate' in repos[currentRepo].keys():
-        command += ' --repo2 ' + repos[duplicateSource]['location'] + ' --copy-chunker-params'
-
-      result = run_command(command, commandEnv)
-      # Return the results
-      successMessage = ("Repository %s successfully created at location %s" % (currentRepo, repos[currentRepo]['location']))
-      errorMessage = ("Error creating repository %s" % repos[currentRepo]['location'])
-
-  if args.action == 'prune':
-      # Clean up repo according to provided preservation policy
-      command = resticLocation + ' forget --group-by host --keep-within ' + \
-          repos[currentRepo]['max_age'] + 'd --prune --repo ' + \
-          repos[currentRepo]['location']
-      result = run_command(command, commandEnv)
-      # Return the results
-      successMessage = ("Repository %s clean up successful" % currentRepo)
-      errorMessage = ("Error cleaning up repository %s" % currentRepo)
-
-  elif args.action == 'check':
-      # Check the repository integrity
-      command = resticLocation + ' check --repo ' + repos[currentRepo]['location']
-      if args.full:
-          command = command + ' --read-data'
-      result = run_command(command, commandEnv)
-      # Check the restic return code
-      errorMessage = ''
-      if not result.returncode == 0:
-          errorMessage = ("Error checking repository %s" % currentRepo)
-      else:
-          # If requested, check the snapshots age
-          if args.age:
-              command = resticLocation + ' snapshots --json --group-by host --repo ' + \
-                  repos[currentRepo]['location']
-              result2 = run_command(command, commandEnv)
-              if not result2.returncode == 0:
-                  errorMessage = (
-                      "Error getting snapshots for repository %s" % currentRepo)
-                  result.stderr = result.stderr + "\n" + result2.stderr
-                  result.returncode = 2
-              else:
-                  snaps = json.loads(result2.stdout)
-                  # Oldest snapshot is the first one
-                  oldestTime = snaps[0]['snapshots'][0]['time']
-                  # Newest snapshot is the last one
-                  newestTime = snaps[0]['snapshots'][len(
-                      snaps[0]['snapshots'])-1]['time']
-                  # Convert to Pythonic time structures
-                  timeFormat = '%Y-%m-%dT%H:%M:%S'
-                  oldestTime = datetime.strptime(oldestTime[0:18], timeFormat)
-                  newestTime = datetime.strptime(newestTime[0:18], timeFormat)
-                  # Compute snapshots ages versus the current time
-                  currentTime = datetime.now()
-                  oldDiff = currentTime - oldestTime
-                  newDiff = currentTime - newestTime
-                  # Check ages versus config
-                  if oldDiff > timedelta(days=int(repos[currentRepo]['max_age'])):
-                      errorMessage = (
-                          "Oldest snapshot on %s is %s old" % (currentRepo, oldDiff))
-                  if newDiff > timedelta(days=int(repos[currentRepo]['min_age'])):
-                      errorMessage = (
-                          "Newest snapshot on %s is %s old" % (currentRepo, newDiff))
-                  else:
-                      result.stdout = result.stdout + "\n" + \
-                          ("Newest snapshot age: %s" % newDiff) + \
-                          "\n" + ("Oldest snapshot age: %s" % oldDiff)
-      # Return the results
-      successMessage = ("Repository %s is healthy" % currentRepo)
-      # errorMessage is already defined
-
-  elif args.action == 'list':
-      # List snapshots in the repo
-      command = resticLocation + ' snapshots --group-by host --repo ' + \
-          repos[currentRepo]['location']
-      result = run_command(command, commandEnv)
-      # Return the results
-      successMessage = ("Snapshot list retreived for repository %s" % currentRepo)
-      errorMessage = ("Error listing snapshots on repository %s" % repos[currentRepo]['location'])
+# Run the requested action on all selected repositories.  Repos targeting
+# distinct locations are independent of each other, so they are processed
+# concurrently; if two entries resolve to the same location (or share a
+# duplicate source) we fall back to a sequential run to respect restic's
+# per-repository lock
+plans = [build_plan(repos, entry) for entry in reposToProcess]
+
+repoLocations = []
+for plan in plans:
+  repoLocations.append(plan.location)
+  if plan.duplicateSource:
+    repoLocations.append(plan.sourceLocation)
+
+maxWorkers = min(len(plans), os.cpu_count() * 2)
+if maxWorkers > 1 and len(set(repoLocations)) == len(repoLocations):
+  with ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+    repoResults = list(executor.map(process_repo, plans))
+else:
+  repoResults = [process_repo(plan) for plan in plans]
 
-  else:
-      # If this is a duplicate type repo, we copy snapshots from the source to the destination
-      if 'duplicate' in repos[currentRepo].keys():
-        command = resticLocation + ' copy --repo2 ' + repos[currentRepo]['location'] + ' --repo ' + repos[duplicateSource]['location']
-        result = run_command(command, commandEnv)
-        # Swap the repositories password to enable the unlock
-        commandEnv["RESTIC_PASSWORD"] = commandEnv["RESTIC_PASSWORD2"]
-
-      # For a standard repo, create a new snapshot
-      else:
-        command = resticLocation + ' backup --exclude \'lost+found\' --repo ' + repos[currentRepo]['location']
-        # Incorporate includes (mandatory)
-        for folder in repos[currentRepo]['includes']:
-          command = command + ' ' + folder
-        # Incorporate excludes if present
-        if 'excludes' in repos[currentRepo].keys():
-          for folder in repos[currentRepo]['excludes']:
-            command = command + ' --exclude="' + folder + '"'
-        result = run_command(command, commandEnv)        
-      
-      # Return the results
-      successMessage = ("Snapshot successfully created on repository %s" % currentRepo)
-      errorMessage = ("Error creating new snapshot on repository %s" % repos[currentRepo]['location'])
-
-  # At the end of each loop round, we accumulate the outputs to prepare the final script output
-  if not result.returncode == 0:
+# Accumulate the outputs to prepare the final script output
+for (returnCode, successMessage, errorMessage, stdOut, stdErr) in repoResults:
+  if not returnCode == 0:
     scriptReturnValue = 2
-  successMessageAccumulated += successMessage + ". "
-  errorMessageAccumulated += errorMessage + ". "
-  stdoutAccumulated += result.stdout
-  stderrAccumulated += result.stderr
-
-  # Ensure the repository is unlocked
-  command = resticLocation + ' unlock --repo ' + repos[currentRepo]['location']
-  resultUnlock = run_command(command, commandEnv)
-  stdoutAccumulated += resultUnlock.stdout
-  stderrAccumulated += resultUnlock.stderr
-  if scriptReturnValue < 2 and not resultUnlock.returncode == 0:
-    scriptReturnValue = 1
+  successMessages.append(successMessage)
+  errorMessages.append(errorMessage)
+  stdoutParts.append(stdOut)
+  stderrParts.append(stdErr)
 
 # Provide the user output
 end_script(
   scriptReturnValue,
-  stdoutAccumulated,
-  stderrAccumulated,
-  successMessageAccumulated,
-  errorMessageAccumulated,
+  ''.join(stdoutParts),
+  ''.join(stderrParts),
+  '. '.join(successMessages) + '. ',
+  '. '.join(errorMessages) + '. ',
   args.quiet,
   args.verbose
 )
\ No newline at end of file